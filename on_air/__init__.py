@@ -1,34 +1,85 @@
 #!/usr/bin/env python
 
 import argparse
+import ctypes
+import functools
 import glob
 import json
 import logging
-import re
+import os
+import select
 import signal
 import socket
-import subprocess
+import struct
 import sys
+import threading
 import time
-from collections import defaultdict
-from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
-from typing import Any, Callable, DefaultDict, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import Future
+from dataclasses import dataclass, fields
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    get_type_hints,
+)
 
 from blink1.blink1 import Blink1
+from google.api_core.exceptions import (
+    Aborted,
+    DeadlineExceeded,
+    InternalServerError,
+    ResourceExhausted,
+    RetryError,
+    ServiceUnavailable,
+    Unknown,
+)
 from google.auth import jwt
 from google.cloud import pubsub
+from google.pubsub_v1.services.publisher.transports import PublisherGrpcTransport
+from google.pubsub_v1.services.subscriber.transports import SubscriberGrpcTransport
 
 Payload = Dict[str, Any]
 
 _log = logging.getLogger(__file__)
 
-_LSOF_KNOWN_ERRORS = re.compile(
-    r"(?:Output information may be incomplete\.|WARNING: can't stat\(\) .* file system)"
-)
+_PROC = "/proc"
+_DEV = "/dev/"
 
 _GLOB_AUDIO_DEVICES = "/dev/snd/pcmC*D*c"
 _GLOB_VIDEO_DEVICES = "/dev/video*"
+# Map of {hardware key -> device glob pattern}
+_GLOB_DEVICES = {"audio": _GLOB_AUDIO_DEVICES, "video": _GLOB_VIDEO_DEVICES}
+
+# Audio/video state, packed as bit flags
+ComputedState = int
+_STATE_AUDIO = 1
+_STATE_VIDEO = 2
+
+# inotify(7) event flags for a device being opened or closed
+_IN_CLOSE_WRITE = 0x00000008
+_IN_CLOSE_NOWRITE = 0x00000010
+_IN_OPEN = 0x00000020
+_INOTIFY_DEVICE_MASK = _IN_OPEN | _IN_CLOSE_WRITE | _IN_CLOSE_NOWRITE
+# inotify(7) event flags for a device being plugged in or removed
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_INOTIFY_HOTPLUG_MASK = _IN_CREATE | _IN_DELETE
+# Header of a struct inotify_event: wd, mask, cookie, len
+_INOTIFY_EVENT = struct.Struct("iIII")
+# Size of buffer to drain pending inotify events with, bytes
+_INOTIFY_READ_SIZE = 4096
+# Time to let device activity settle before checking it, seconds
+_INOTIFY_DEBOUNCE = 0.05
+
+# Time to reuse device glob results for, seconds
+_GLOB_TTL = 5.0
+# Map of {glob pattern -> (monotonic time of glob, paths, device numbers)}
+_glob_cache: Dict[str, Tuple[float, List[str], Set[int]]] = {}
 
 
 class OnAirError(Exception):
@@ -39,64 +90,290 @@ class SystemError(OnAirError):
     pass
 
 
-def lsof(pattern: str) -> List[str]:
-    """List file owner PIDs for the given glob pattern."""
-    files = glob.glob(pattern)
-    response = subprocess.run(
-        ["/usr/bin/lsof", "-t"] + files,
-        capture_output=True,
-        text=True,
-    )
-    if response.returncode != 0:
-        # Expect some errors, these are fine
-        for line in response.stderr.split("\n"):
-            if len(line.strip()) == 0:
-                continue
+def _glob_devices(pattern: str) -> Tuple[List[str], Set[int]]:
+    """List device paths and numbers for the given glob pattern.
 
-            if not _LSOF_KNOWN_ERRORS.search(line):
-                _log.error(line)
-                raise SystemError(
-                    f"Unexpected error from lsof: '{line}', "
-                    f"stdout '{response.stdout}', stderr '{response.stderr}'"
-                )
+    Device nodes only change on hotplug, so results are cached for a short
+    time, or until invalidated.
+    """
+    now = time.monotonic()
+    cached = _glob_cache.get(pattern)
+    if cached is not None and now - cached[0] < _GLOB_TTL:
+        return cached[1], cached[2]
+
+    paths = glob.glob(pattern)
+    numbers = set()
+    for path in paths:
+        try:
+            numbers.add(os.stat(path).st_rdev)
+        except OSError:
+            # The device was removed since we listed it
+            continue
+
+    _glob_cache[pattern] = (now, paths, numbers)
+    return paths, numbers
+
+
+def glob_devices(pattern: str) -> List[str]:
+    """List device paths for the given glob pattern."""
+    return _glob_devices(pattern)[0]
+
+
+def device_numbers(pattern: str) -> Set[int]:
+    """List device numbers for the given glob pattern."""
+    return _glob_devices(pattern)[1]
 
-    stdout = response.stdout.rstrip()
-    if len(stdout) > 0:
-        owners = stdout.split("\n")
+
+def invalidate_devices() -> None:
+    """Forget cached device paths, after a device is added or removed."""
+    _glob_cache.clear()
+
+
+def lsof_many(patterns: Dict[str, str]) -> Dict[str, List[str]]:
+    """List file owner PIDs for each of the given named glob patterns.
+
+    Scans the open file descriptors of each process under ``/proc`` directly,
+    rather than spawning ``lsof`` on every poll, and only once for all
+    patterns. Descriptors are matched by device number, so a device opened
+    through another node or mount still counts.
+    """
+    owners: Dict[str, List[str]] = {name: [] for name in patterns}
+
+    # Map of {device number -> names of patterns matching it}
+    targets: Dict[int, List[str]] = {}
+    for name, pattern in patterns.items():
+        for number in device_numbers(pattern):
+            targets.setdefault(number, []).append(name)
+    if len(targets) == 0:
         return owners
 
-    return []
+    try:
+        processes = os.scandir(_PROC)
+    except OSError as error:
+        raise SystemError(f"Unable to scan '{_PROC}': {error}") from error
+
+    with processes:
+        for process in processes:
+            if not process.name.isdigit():
+                continue
+
+            try:
+                fds = os.scandir(f"{process.path}/fd")
+            except OSError:
+                # The process exited, or we do not have permission to see its
+                # file descriptors
+                continue
+
+            matched: Set[str] = set()
+            with fds:
+                for fd in fds:
+                    try:
+                        # Only stat device files. Other files may be on a
+                        # network file system, where stat can block.
+                        if not os.readlink(fd.path).startswith(_DEV):
+                            continue
+                        device = os.stat(fd.path).st_rdev
+                    except OSError:
+                        # The file descriptor was closed while we were scanning
+                        continue
+
+                    names = targets.get(device)
+                    if names is None:
+                        continue
+                    matched.update(names)
+                    if len(matched) == len(patterns):
+                        break
+
+            for name in matched:
+                owners[name].append(process.name)
+
+    return owners
+
+
+class DeviceWatcher:
+    """Wait for local audio/video devices to be opened or closed.
+
+    Uses inotify(7) so that we sleep until the kernel reports activity on a
+    device. If inotify is unavailable, waiting falls back to a plain sleep.
+
+    Device directories are also watched, so that hotplugged devices are picked
+    up and cached device paths are invalidated.
+    """
+
+    _libc: Optional[ctypes.CDLL]
+    _fd: Optional[int]
+    _patterns: Tuple[str, ...]
+
+    def __init__(self, patterns: Iterable[str]):
+        self._libc = None
+        self._fd = None
+        self._patterns = tuple(patterns)
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        except (AttributeError, OSError) as error:
+            _log.warning("inotify unavailable, polling instead: %s", error)
+            return
+
+        self._libc = libc
+        self._fd = fd
+        for directory in {os.path.dirname(pattern) for pattern in self._patterns}:
+            self._add_watch(directory, _INOTIFY_HOTPLUG_MASK)
+        self._watch_devices()
+
+    def __enter__(self, *args):
+        return self
+
+    def __exit__(self, *args):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _add_watch(self, path: str, mask: int) -> None:
+        watch = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if watch < 0:
+            _log.warning("Unable to watch path: '%s'", path)
+
+    def _watch_devices(self) -> None:
+        """Watch all current device nodes. Existing watches are unaffected."""
+        for pattern in self._patterns:
+            for path in glob_devices(pattern):
+                self._add_watch(path, _INOTIFY_DEVICE_MASK)
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until a device is opened or closed, or the timeout expires.
+
+        Returns whether any device activity was seen.
+        """
+        if self._fd is None:
+            time.sleep(timeout)
+            return False
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+
+        hotplug = self._drain()
+        # Opening a device, or joining a call, often touches several devices at
+        # once. Let that settle so a single check sees the result.
+        time.sleep(_INOTIFY_DEBOUNCE)
+        hotplug = self._drain() or hotplug
+
+        if hotplug:
+            _log.debug("Device added or removed")
+            invalidate_devices()
+            self._watch_devices()
+        return True
+
+    def _drain(self) -> bool:
+        """Discard pending events, returning whether any were for hotplug."""
+        hotplug = False
+        try:
+            while True:
+                buffer = os.read(self._fd, _INOTIFY_READ_SIZE)
+                offset = 0
+                while offset < len(buffer):
+                    _, mask, _, length = _INOTIFY_EVENT.unpack_from(buffer, offset)
+                    if mask & _INOTIFY_HOTPLUG_MASK:
+                        hotplug = True
+                    offset += _INOTIFY_EVENT.size + length
+        except BlockingIOError:
+            pass
+
+        return hotplug
+
+
+# Time a changed state must hold before it is published, seconds. Devices are
+# often opened or closed together, this sends the result in one message.
+_PUBLISH_DEBOUNCE = 0.2
+# Consecutive overrunning checks before warning that we are falling behind
+_OVERRUN_WARN_AFTER = 5
 
 
 def poll_av_and_publish(
     poll_interval: int,
     publish_payload: Callable[[Payload], None],
     source_name: str,
+    publish_failed: Optional[threading.Event] = None,
 ) -> None:
-    """Poll local audio/video hardware in a loop, and publish update messages."""
+    """Watch local audio/video hardware in a loop, and publish update messages.
+
+    Hardware is checked whenever a device is opened or closed, and at least
+    every ``poll_interval`` seconds. If ``publish_failed`` is set, the current
+    state is published again on the next check.
+    """
 
     # This will loop forever, so set a nice shutdown handler
     signal.signal(signal.SIGINT, shutdown)
 
-    last_payload: Optional[Payload] = None
+    last_state: Optional[ComputedState] = None
+    # A changed state, waiting to settle before it is published
+    pending_state: Optional[ComputedState] = None
+    pending_deadline = 0.0
 
     _log.info("Watching for changes in local audio/video state")
-    while True:
-        _log.debug("Polling local audio/video state")
-        audio_owners = lsof(_GLOB_AUDIO_DEVICES)
-        video_owners = lsof(_GLOB_VIDEO_DEVICES)
-
-        payload = {
-            "audio": len(audio_owners) > 0,
-            "video": len(video_owners) > 0,
-            "source": source_name,
-        }
-
-        if payload != last_payload:
-            last_payload = payload
-            publish_payload(payload)
+    with DeviceWatcher(_GLOB_DEVICES.values()) as watcher:
+        # Keep a steady cadence of checks, however long each one takes
+        deadline = time.monotonic()
+        overruns = 0
+        while True:
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug("Polling local audio/video state")
+            owners = lsof_many(_GLOB_DEVICES)
+
+            if publish_failed is not None and publish_failed.is_set():
+                # The last state we sent never arrived, so forget it
+                publish_failed.clear()
+                last_state = None
+
+            state = 0
+            if owners["audio"]:
+                state |= _STATE_AUDIO
+            if owners["video"]:
+                state |= _STATE_VIDEO
+
+            now = time.monotonic()
+            if state == last_state:
+                # Any pending change has reverted, so there is nothing to send
+                pending_state = None
+            elif state != pending_state:
+                pending_state = state
+                pending_deadline = now + _PUBLISH_DEBOUNCE
+            elif now >= pending_deadline:
+                last_state = state
+                pending_state = None
+                publish_payload(
+                    {
+                        "audio": bool(state & _STATE_AUDIO),
+                        "video": bool(state & _STATE_VIDEO),
+                        "source": source_name,
+                    }
+                )
 
-        time.sleep(poll_interval)
+            now = time.monotonic()
+            if now >= deadline:
+                deadline += poll_interval
+                if deadline <= now:
+                    # We overran, so start afresh rather than check in a burst
+                    deadline = now + poll_interval
+                    overruns += 1
+                    # Warn once per run of overruns. A zero interval always
+                    # overruns by design, so never warn about that.
+                    if poll_interval > 0 and overruns == _OVERRUN_WARN_AFTER:
+                        _log.warning(
+                            "Falling behind, checks are taking longer than the "
+                            "poll interval of %ss",
+                            poll_interval,
+                        )
+                else:
+                    overruns = 0
+
+            wake = deadline
+            if pending_state is not None:
+                wake = min(wake, pending_deadline)
+            watcher.wait(max(0.0, wake - now))
 
 
 @dataclass
@@ -109,79 +386,148 @@ class Config:
 
     @staticmethod
     def from_args(args: argparse.Namespace) -> "Config":
-        google_credential = None
-        google_project_id = None
-        poll_interval = None
-        topic_name = None
-        source_name = None
-
+        raw_config_json: Dict[str, Any] = {}
         if args.config:
             with open(args.config, "r") as config_file:
                 raw_config_json = json.load(config_file)
 
-            google_credential = raw_config_json.get("google_credential")
-            google_project_id = raw_config_json.get("google_project_id")
-            poll_interval = raw_config_json.get("poll_interval")
-            topic_name = raw_config_json.get("topic_name")
-            source_name = raw_config_json.get("source_name")
-
-        if args.google_credential:
-            google_credential = args.google_credential
-        if args.google_project_id:
-            google_project_id = args.google_project_id
-        if args.poll_interval:
-            poll_interval = args.poll_interval
-        if args.topic_name:
-            topic_name = args.topic_name
-        if args.source_name:
-            source_name = args.source_name
-
-        if not source_name:
-            source_name = socket.gethostname()
-
-        if google_credential is None or not isinstance(google_credential, str):
-            raise ValueError(f"Invalid google_credential: '{google_credential}'")
-        if google_project_id is None or not isinstance(google_project_id, str):
-            raise ValueError(f"Invalid google_project_id: '{google_project_id}'")
-        if poll_interval is None or not isinstance(poll_interval, int):
-            raise ValueError(f"Invalid poll_interval: '{poll_interval}'")
-        if topic_name is None or not isinstance(topic_name, str):
-            raise ValueError(f"Invalid topic_name: '{topic_name}'")
-        if source_name is None or not isinstance(source_name, str):
-            raise ValueError(f"Invalid source_name: '{source_name}'")
-
-        return Config(
-            google_credential=google_credential,
-            google_project_id=google_project_id,
-            poll_interval=poll_interval,
-            topic_name=topic_name,
-            source_name=source_name,
-        )
+        # Command line arguments override values from the config file
+        merged = {
+            **raw_config_json,
+            **{name: value for name, value in vars(args).items() if value},
+        }
+        values = {
+            config_field.name: merged.get(config_field.name)
+            for config_field in fields(Config)
+        }
+
+        if not values["source_name"]:
+            values["source_name"] = socket.gethostname()
+
+        for name, field_type in get_type_hints(Config).items():
+            value = values[name]
+            if value is None or not isinstance(value, field_type):
+                raise ValueError(f"Invalid {name}: '{value}'")
+
+        return Config(**values)
+
+
+_PUBSUB_HOST = "pubsub.googleapis.com:443"
+# The client library's default channel options, plus keepalive pings every 30s
+# even while no call is active. Without pings an idle channel is never probed,
+# so a connection silently dropped by a NAT would only be found by the next
+# publish. If Google's front end considers the pings too frequent, it asks for
+# fewer and gRPC backs off the interval itself.
+_GRPC_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+def pubsub_client_kwargs(
+    transport_class: type, credentials: jwt.Credentials
+) -> Dict[str, Any]:
+    """Keyword arguments for a Pub/Sub client, using our channel options.
+
+    When ``PUBSUB_EMULATOR_HOST`` is set, the client builds its own channel to
+    the emulator and will not accept a transport, so pass credentials instead.
+    """
+    if os.environ.get("PUBSUB_EMULATOR_HOST"):
+        return {"credentials": credentials}
+
+    channel = transport_class.create_channel(
+        _PUBSUB_HOST,
+        credentials=credentials,
+        options=_GRPC_CHANNEL_OPTIONS,
+    )
+    return {"transport": transport_class(host=_PUBSUB_HOST, channel=channel)}
+
+
+def load_credentials(path: str, audience: str) -> jwt.Credentials:
+    """Load service account credentials from a JSON key file."""
+    with open(path, "rb") as credential_file:
+        service_account_info = json.load(credential_file)
+
+    return jwt.Credentials.from_service_account_info(
+        service_account_info, audience=audience
+    )
+
+
+# Publish batches are flushed at whichever of these limits is reached first
+_PUBLISH_BATCH_SETTINGS = pubsub.types.BatchSettings(
+    max_messages=100,
+    max_bytes=40000,
+    max_latency=0.05,
+)
+# Bound the messages waiting to be sent, blocking the polling loop beyond that
+_PUBLISHER_OPTIONS = pubsub.types.PublisherOptions(
+    flow_control=pubsub.types.PublishFlowControl(
+        message_limit=16,
+        limit_exceeded_behavior=pubsub.types.LimitExceededBehavior.BLOCK,
+    ),
+)
+
+
+def _log_publish_result(publish_failed: threading.Event, future: Future) -> None:
+    """Callback to report the outcome of an asynchronous publish."""
+    error = future.exception()
+    if error is not None:
+        _log.error("Failed to publish message: %s", error)
+        publish_failed.set()
+    else:
+        _log.debug("Published message: '%s'", future.result())
 
 
 def run_stream(args: argparse.Namespace) -> None:
     """Entrypoint for the streaming client."""
     config = Config.from_args(args)
 
-    service_account_info = json.load(open(config.google_credential))
-    audience = "https://pubsub.googleapis.com/google.pubsub.v1.Publisher"
-    credentials = jwt.Credentials.from_service_account_info(
-        service_account_info, audience=audience
+    credentials = load_credentials(
+        config.google_credential,
+        audience="https://pubsub.googleapis.com/google.pubsub.v1.Publisher",
+    )
+    publisher = pubsub.PublisherClient(
+        batch_settings=_PUBLISH_BATCH_SETTINGS,
+        publisher_options=_PUBLISHER_OPTIONS,
+        **pubsub_client_kwargs(PublisherGrpcTransport, credentials),
     )
-    publisher = pubsub.PublisherClient(credentials=credentials)
     topic_name = f"projects/{config.google_project_id}/topics/{config.topic_name}"
 
+    # Our source name is fixed, so there are only four possible payloads.
+    # Encode them all up front.
+    encoded_payloads = {
+        (audio, video): json.dumps(
+            {"audio": audio, "video": video, "source": config.source_name}
+        ).encode("utf-8")
+        for audio in (False, True)
+        for video in (False, True)
+    }
+
+    publish_failed = threading.Event()
+    on_published = functools.partial(_log_publish_result, publish_failed)
+
     def publish_payload(payload: Payload) -> None:
-        data = json.dumps(payload)
-        _log.info("Publishing message: '%s'", data)
-        future = publisher.publish(topic_name, data.encode("utf-8"))
-        future.result()
-
-    poll_av_and_publish(
-        poll_interval=config.poll_interval,
-        publish_payload=publish_payload,
-        source_name=config.source_name,
-    )
+        data = encoded_payloads[(payload["audio"], payload["video"])]
+        _log.info("Publishing message: '%s'", payload)
+        # Don't block the polling loop on the round trip. Failures are logged,
+        # and flagged so the polling loop will publish again
+        future = publisher.publish(topic_name, data)
+        future.add_done_callback(on_published)
+
+    try:
+        poll_av_and_publish(
+            poll_interval=config.poll_interval,
+            publish_payload=publish_payload,
+            source_name=config.source_name,
+            publish_failed=publish_failed,
+        )
+    finally:
+        # Flush any messages still waiting in a batch
+        publisher.stop()
 
 
 # Time for an interval of blinking, seconds
@@ -193,103 +539,222 @@ Rgb = Tuple[int, int, int]
 _RGB_VIDEO = (255, 0, 0)
 _RGB_AUDIO = (0, 0, 255)
 _RGB_OFF = (0, 0, 0)
+_RGB_COLORS = (_RGB_VIDEO, _RGB_AUDIO, _RGB_OFF)
+
+# Map of {(current color, new color) -> first of two blink(1) pattern lines}
+# Fits in the 12 pattern lines available on every blink(1) model
+_BLINK_PATTERN_LINES: Dict[Tuple[Rgb, Rgb], int] = {
+    transition: index * 2
+    for index, transition in enumerate(
+        (current, new)
+        for current in _RGB_COLORS
+        for new in _RGB_COLORS
+        if current != new
+    )
+}
 
 
 _HARDWARE_KEYS = ("audio", "video")
 
 
-@dataclass(eq=True, frozen=True)
-class ComputedState:
-    audio: bool
-    video: bool
-
-    @staticmethod
-    def from_source_states(source_states: Iterable[Payload]) -> "ComputedState":
-        audio = False
-        video = False
-
-        for state in source_states:
-            if state["audio"]:
-                audio = True
-            if state["video"]:
-                video = True
-
-        return ComputedState(audio=audio, video=video)
-
-
 class DisplayState:
     _device: Optional[Blink1]
-    # Map of {source name -> Payload}
-    _source_states: DefaultDict[str, Payload]
-    # Computed hash over all source states
+    # Names of sources currently using audio
+    _audio_sources: Set[str]
+    # Names of sources currently using video
+    _video_sources: Set[str]
+    # Computed state over all sources
     _state: ComputedState
-    # Last color to display
+    # Latest color requested by an update
+    _next_color: Rgb
+    # Last color displayed, only used by the display thread
     _last_color: Rgb
+    # Serializes updates, and handover to the display thread
+    _lock: threading.Lock
+    # Set when there is a new color, or we are stopping
+    _wake: threading.Event
+    _stopping: bool
+    # Set if the display thread could not update the device, and has exited
+    failed: threading.Event
+    # Applies the latest color to the device, skipping any superseded colors
+    _display_thread: threading.Thread
 
     def __init__(self, device):
         self._device = device
-        self._source_states = defaultdict(dict)
-        self._state = ComputedState(audio=False, video=False)
+        self._lock = threading.Lock()
+        self._audio_sources = set()
+        self._video_sources = set()
+        self._state = 0
+        self._next_color = _RGB_OFF
         self._last_color = _RGB_OFF
+        self._wake = threading.Event()
+        self._stopping = False
+        self.failed = threading.Event()
+
+        if self._device:
+            self._write_blink_patterns()
+
+        self._display_thread = threading.Thread(target=self._display, daemon=True)
+        self._display_thread.start()
 
     def __enter__(self, *args):
         return self
 
     def __exit__(self, *args):
+        with self._lock:
+            self._stopping = True
+            self._wake.set()
+        self._display_thread.join()
+
         if self._device:
-            self._device.off()
+            # A failed device may be gone, so leave it as it is
+            if not self.failed.is_set():
+                # Stop any blink still playing, or it would finish on its color
+                self._device.stop()
+                self._device.off()
+            # Release the HID handle, which is held open for our lifetime
+            self._device.close()
+
+    def _write_blink_patterns(self) -> None:
+        """Upload a blink pattern for each color transition to the device."""
+        step_milliseconds = int(_BLINK_DURATION * 1000)
+        for (current, new), line in _BLINK_PATTERN_LINES.items():
+            self._device.write_pattern_line(step_milliseconds, current, line)
+            self._device.write_pattern_line(step_milliseconds, new, line + 1)
 
-    def _solid(self, color: Rgb) -> None:
+    def _blink(self, color: Rgb) -> None:
+        """Blink the given new color, alternating with the current color.
+
+        The blink is played from the device's pattern memory and finishes on
+        the new color, so this returns without waiting for it.
+        """
         _log.debug("Color set: '%s'", color)
         if self._device:
-            self._device.fade_to_rgb(0, *color)
+            line = _BLINK_PATTERN_LINES[(self._last_color, color)]
+            self._device.play(line, line + 1, _BLINK_REPEAT)
+
+    def _display(self) -> None:
+        """Display thread, showing the latest color until stopped."""
+        while True:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                if self._stopping:
+                    return
+                color = self._next_color
+
+            if color == self._last_color:
+                continue
 
-    def _blink(self, color: Rgb) -> None:
-        """Blink the given new color, alternating back to the current color."""
-        for _ in range(0, _BLINK_REPEAT):
-            self._solid(color)
-            time.sleep(_BLINK_DURATION)
-            self._solid(self._last_color)
-            time.sleep(_BLINK_DURATION)
+            try:
+                self._blink(color)
+            except Exception:
+                # The device may have been unplugged. Give up, so that the
+                # listener exits and is restarted with a fresh connection.
+                _log.exception("Failed to update display")
+                self.failed.set()
+                return
+            self._last_color = color
 
     def update(self, payload: Payload) -> None:
+        """Update the state of a source, and the display to match.
+
+        The display is updated in the background. If several updates arrive
+        while it is busy, only the latest is shown.
+        """
+        with self._lock:
+            self._update(payload)
+
+    def _update(self, payload: Payload) -> None:
         source_name = payload["source"]
-        previous_source_state = self._source_states[source_name]
-        if previous_source_state == payload:
-            _log.debug("Source state is unchanged: '%s'", payload)
+        audio = bool(payload["audio"])
+        video = bool(payload["video"])
+        if (source_name in self._audio_sources) == audio and (
+            source_name in self._video_sources
+        ) == video:
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug("Source state is unchanged: '%s'", payload)
             return
-        self._source_states[source_name] = payload
 
-        state = ComputedState.from_source_states(self._source_states.values())
+        if audio:
+            self._audio_sources.add(source_name)
+        else:
+            self._audio_sources.discard(source_name)
+        if video:
+            self._video_sources.add(source_name)
+        else:
+            self._video_sources.discard(source_name)
+
+        state = 0
+        if self._audio_sources:
+            state |= _STATE_AUDIO
+        if self._video_sources:
+            state |= _STATE_VIDEO
         if self._state == state:
-            _log.debug("Computed state is unchanged: '%s'", state)
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug("Computed state is unchanged: '%s'", state)
             return
         self._state = state
         _log.debug("Computed state updated: '%s'", state)
 
-        if state.video:
+        if state & _STATE_VIDEO:
             color = _RGB_VIDEO
-        elif state.audio:
+        elif state & _STATE_AUDIO:
             color = _RGB_AUDIO
         else:
             color = _RGB_OFF
 
-        self._blink(color)
-        self._solid(color)
-        self._last_color = color
+        if color == self._next_color:
+            # For example audio changing while video is on
+            return
+
+        self._next_color = color
+        self._wake.set()
+
+
+# Maximum age of a message to display, seconds
+_LISTEN_SKEW = 60.0
 
 
-_LISTEN_SKEW = timedelta(minutes=1)
+@functools.lru_cache(maxsize=64)
+def decode_payload(data: bytes) -> Payload:
+    """Decode a message payload.
+
+    Each source only sends four distinct payloads, so decoded payloads are
+    cached. They are shared between calls, and must not be modified.
+    """
+    # json accepts UTF-8 bytes directly
+    return json.loads(data)
+
+
+# Maximum number of messages to fetch with each pull
+_PULL_MAX_MESSAGES = 16
+# Time to wait for messages in each pull, seconds. Also bounds how long it
+# takes to notice a shutdown request.
+_PULL_TIMEOUT = 10
+# Errors worth waiting out, rather than giving up on listening
+_PULL_TRANSIENT_ERRORS = (
+    Aborted,
+    InternalServerError,
+    ResourceExhausted,
+    RetryError,
+    ServiceUnavailable,
+    Unknown,
+)
+# Bounds on the wait after a failed pull or acknowledge, seconds
+_PULL_BACKOFF_INITIAL = 1.0
+_PULL_BACKOFF_MAX = 60.0
 
 
 def run_listen(args: argparse.Namespace) -> None:
     """Entrypoint for the listening client."""
-    service_account_info = json.load(open(args.google_credential))
-    audience = "https://pubsub.googleapis.com/google.pubsub.v1.Subscriber"
-    credentials = jwt.Credentials.from_service_account_info(
-        service_account_info, audience=audience
+    credentials = load_credentials(
+        args.google_credential,
+        audience="https://pubsub.googleapis.com/google.pubsub.v1.Subscriber",
+    )
+    subscriber = pubsub.SubscriberClient(
+        **pubsub_client_kwargs(SubscriberGrpcTransport, credentials),
     )
-    subscriber = pubsub.SubscriberClient(credentials=credentials)
     subscription_name = (
         f"projects/{args.google_project_id}/subscriptions/{args.subscription_name}"
     )
@@ -303,29 +768,80 @@ def run_listen(args: argparse.Namespace) -> None:
     with DisplayState(device) as display_state:
 
         def recieve_message(message) -> None:
-            now = datetime.now(tz=timezone.utc)
-            if message.publish_time < (now - _LISTEN_SKEW):
-                _log.debug(
-                    "Discarding skewed message: now '%s', message '%s'",
-                    now,
-                    message.publish_time,
-                )
-                message.ack()
+            now = time.time()
+            if message.publish_time.timestamp() < now - _LISTEN_SKEW:
+                if _log.isEnabledFor(logging.DEBUG):
+                    _log.debug(
+                        "Discarding skewed message: now '%s', message '%s'",
+                        now,
+                        message.publish_time,
+                    )
                 return
 
-            payload = message.data.decode("utf-8")
-            _log.info("Recieved message: %s", payload)
-            data = json.loads(payload)
+            data = decode_payload(message.data)
+            _log.info("Recieved message: %s", data)
             display_state.update(data)
 
-            message.ack()
+        # Shut down from the listening loop rather than inside the signal
+        # handler, so that the subscriber is closed before the display is
+        # switched off
+        stop = threading.Event()
+
+        def request_stop(signal_number, frame) -> None:
+            _log.info("Received signal '%s', shutting down", signal_number)
+            stop.set()
 
-        # This will loop forever, so set a nice shutdown handler
-        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGINT, request_stop)
 
+        # Messages are rare and only the latest state matters, so pull them
+        # directly rather than managing a streaming pull and message leases
         _log.info("Listening for published updates")
-        future = subscriber.subscribe(subscription_name, recieve_message)
-        future.result()
+        try:
+            backoff = _PULL_BACKOFF_INITIAL
+            while not stop.is_set() and not display_state.failed.is_set():
+                try:
+                    response = subscriber.pull(
+                        subscription=subscription_name,
+                        max_messages=_PULL_MAX_MESSAGES,
+                        timeout=_PULL_TIMEOUT,
+                    )
+                    if response.received_messages:
+                        for received_message in response.received_messages:
+                            recieve_message(received_message.message)
+
+                        if display_state.failed.is_set():
+                            # Leave these to be redelivered after a restart
+                            break
+
+                        subscriber.acknowledge(
+                            subscription=subscription_name,
+                            ack_ids=[
+                                received_message.ack_id
+                                for received_message in response.received_messages
+                            ],
+                        )
+                except DeadlineExceeded:
+                    continue
+                except _PULL_TRANSIENT_ERRORS as error:
+                    # Unacknowledged messages are redelivered, and displaying
+                    # the same state twice is harmless
+                    _log.warning(
+                        "Failed to receive messages, retrying in %ss: %s",
+                        backoff,
+                        error,
+                    )
+                    stop.wait(backoff)
+                    backoff = min(backoff * 2, _PULL_BACKOFF_MAX)
+                    continue
+
+                backoff = _PULL_BACKOFF_INITIAL
+        finally:
+            subscriber.close()
+
+        if display_state.failed.is_set():
+            # Exit with an error, so that the service is restarted and
+            # reconnects to the device
+            sys.exit(1)
 
 
 def shutdown(signal_number, frame):
@@ -370,7 +886,7 @@ def main() -> None:
     stream.add_argument(
         "--poll-interval",
         type=int,
-        help="Interval to check local state in seconds",
+        help="Maximum interval between checks of local state in seconds",
     )
     stream.add_argument(
         "--topic-name",